@@ -1,5 +1,7 @@
 import argparse
+import json
 import os
+import sys
 import tempfile
 
 import numpy as np
@@ -191,10 +193,32 @@ def main(args: argparse.Namespace):
             raise ValueError(f"Unsupported output format: {args.output_path}")
 
 
+def serve():
+    """Run `main` for every JSON-encoded argument dict read from stdin, one per line.
+
+    Each request is answered with a single JSON line (`{"ok": true}` or `{"ok": false, "error": ...}`)
+    on the original stdout, which is detached from fd 1 so that Blender's own output cannot corrupt it.
+    """
+    sys.stdout.flush()
+    out = os.fdopen(os.dup(1), "w", buffering=1)
+    os.dup2(2, 1)
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        try:
+            main(argparse.Namespace(**json.loads(line)))
+            reply = {"ok": True}
+        except Exception as e:
+            reply = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+        sys.stdout.flush()
+        out.write(json.dumps(reply) + "\n")
+
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
-    parser.add_argument("--input_path", type=str, required=True)
-    parser.add_argument("--output_path", type=str, required=True)
+    parser.add_argument("--serve", default=False, action="store_true")
+    parser.add_argument("--input_path", type=str, default=None)
+    parser.add_argument("--output_path", type=str, default=None)
     parser.add_argument("--template_path", type=str, default=None)
     parser.add_argument("--keep_raw", default=False, action="store_true")
     parser.add_argument("--rest_path", type=str, default=None)
@@ -206,4 +230,9 @@ if __name__ == "__main__":
     parser.add_argument("--inplace", default=False, action="store_true")
     args = parser.parse_args()
 
-    main(args)
+    if args.serve:
+        serve()
+    else:
+        if args.input_path is None or args.output_path is None:
+            parser.error("--input_path and --output_path are required")
+        main(args)
@@ -7,31 +7,23 @@ import tempfile
 import gc
 from pathlib import Path
 
+# TF32 matmuls/convs on Ampere+ and cuDNN autotuning (inputs are fixed to N points)
+torch.set_float32_matmul_precision("high")
+torch.backends.cuda.matmul.allow_tf32 = True
+torch.backends.cudnn.benchmark = True
+
 # Add the current directory to the path to import from app.py
 sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
 
-# Monkey patch the app module to define the state variable
-import types
+# Define the state & output symbols normally created by the Gradio UI
 import app
 
-# Create a state variable in the app module
-app.state = "state"
-
-# Create mock Gradio UI components
-app.output_joints_coarse = "output_joints_coarse"
-app.output_normed_input = "output_normed_input"
-app.output_sample = "output_sample"
-app.output_joints = "output_joints"
-app.output_bw = "output_bw"
-app.output_rest_lbs = "output_rest_lbs"
-app.output_rest_vis = "output_rest_vis"
-app.output_anim = "output_anim"
-app.output_anim_vis = "output_anim_vis"
+app.install_headless_stubs()
 
 # Now import functions from app
 from app import (
     DB, init_models, prepare_input, preprocess, infer, vis, vis_blender, finish,
-    clear, get_pose_ignore_list, is_main_thread, load_gs, 
+    clear, apply_output_dir, autocast_bf16, get_pose_ignore_list, is_main_thread, load_gs, 
     Transform3d, str2bool
 )
 
@@ -74,10 +66,6 @@ def parse_args():
     
     return parser.parse_args()
 
-def extract_db(result):
-    """Helper function to extract DB from a result dictionary"""
-    return result[app.state]
-
 def main():
     args = parse_args()
     
@@ -92,51 +80,40 @@ def main():
     print(f"Processing input: {args.input}")
     
     # Step 1: Prepare input
-    result = prepare_input(
+    db = prepare_input(
         input_path=args.input,
         is_gs=args.is_gs,
         opacity_threshold=args.opacity_threshold,
         db=db,
         export_temp=False
     )
-    db = extract_db(result)
     
-    # If output directory was specified, update db's output_dir
+    # If output directory was specified, redirect all output paths there
     if args.output_dir:
-        output_dir = args.output_dir
-        os.makedirs(output_dir, exist_ok=True)
-        db.output_dir = output_dir
-        
-        # Update output paths
-        db.joints_coarse_path = os.path.join(output_dir, "joints_coarse.glb")
-        db.normed_path = os.path.join(output_dir, f"normed{os.path.splitext(args.input)[-1]}")
-        db.sample_path = os.path.join(output_dir, "sample.glb")
-        db.bw_path = os.path.join(output_dir, "bw.glb")
-        db.joints_path = os.path.join(output_dir, "joints.glb")
-        db.rest_lbs_path = os.path.join(output_dir, f"rest_lbs.{'ply' if args.is_gs else 'glb'}")
-        db.rest_vis_path = os.path.join(output_dir, "rest.glb")
-        input_filename = os.path.splitext(os.path.basename(args.input))[0]
-        db.anim_path = os.path.join(output_dir, f"{input_filename}.{'blend' if args.is_gs else 'fbx'}")
-        db.anim_vis_path = os.path.join(output_dir, f"{input_filename}.glb")
+        os.makedirs(args.output_dir, exist_ok=True)
+        apply_output_dir(db, args.output_dir, args.input, args.is_gs)
     
     print("Preprocessing...")
     # Step 2: Preprocess the model
-    result = preprocess(db)
-    db = extract_db(result)
+    db = preprocess(db)
     
     print("Running inference...")
     # Step 3: Run inference to get blend weights and joints
-    result = infer(args.use_normal, db)
-    db = extract_db(result)
+    with torch.inference_mode(), autocast_bf16(str2bool(os.getenv("MIA_BF16", False))):
+        db = infer(args.use_normal, db)
+    db.release_after("infer")
     
     print("Visualizing results...")
-    # Step 4: Visualize
-    result = vis(args.bw_fix, args.bw_vis_bone, args.no_fingers, db)
-    db = extract_db(result)
+    # Step 4: Visualize (post-processes the inference tensors in place, so stay in inference mode)
+    with torch.inference_mode():
+        db = vis(args.bw_fix, args.bw_vis_bone, args.no_fingers, db)
+    # The Blender step is CPU-only, give the cached GPU memory back before it
+    db.release_after("vis")
+    clear()
     
     print("Creating animation...")
     # Step 5: Generate Blender animation
-    result = vis_blender(
+    db = vis_blender(
         args.reset_to_rest, 
         args.no_fingers, 
         args.rest_pose,
@@ -146,7 +123,6 @@ def main():
         args.inplace, 
         db
     )
-    db = extract_db(result)
     
     print(f"Output animatable model: {db.anim_path}")
     print(f"All outputs stored in: {db.output_dir}")
@@ -10,7 +10,7 @@ from torch_cluster import fps
 
 from models_ae import Attention, DiagonalGaussianDistribution, create_autoencoder
 from util.dataset_mixamo import Joint
-from util.utils import find_ckpt
+from util.utils import find_ckpt, load_model_state_dict
 
 Output = NamedTuple(
     "Output",
@@ -411,8 +411,7 @@ class PCAE(nn.Module):
 
     def load(self, pth_path: str, epoch=-1, strict=True, adapt=True):
         pth_path = find_ckpt(pth_path, epoch=epoch)
-        checkpoint = torch.load(pth_path, map_location="cpu")
-        model_state_dict = checkpoint["model"]
+        model_state_dict = load_model_state_dict(pth_path)
         if adapt:
             model_state_dict = self.adapt_ckpt(model_state_dict)
         self.load_state_dict(model_state_dict, strict=strict)
@@ -512,16 +511,18 @@ class PCAE(nn.Module):
 
         return pc_embeddings
 
-    def encode(self, pc: torch.Tensor) -> torch.Tensor:
+    def encode(self, pc: torch.Tensor, sampled_pc: torch.Tensor = None) -> torch.Tensor:
         """
         Args:
             pc: [B, `self.N`, 3]
+            sampled_pc: [B, `self.base.num_latents`, 3], precomputed `self.fps(pc)` (optional)
         Returns:
             [B, 512, 512]
         """
         # _, x = self.base.encode(pc)
 
-        sampled_pc = self.fps(pc)
+        if sampled_pc is None:
+            sampled_pc = self.fps(pc)
         sampled_pc_embeddings = self.embed(sampled_pc)
         pc_embeddings = self.embed(pc)
         cross_attn, cross_ff = self.base.cross_attend_blocks
@@ -575,18 +576,24 @@ class PCAE(nn.Module):
         return self.base.forward(pc, queries)["logits"].unsqueeze(-1)
 
     def forward(
-        self, pc: torch.Tensor, queries: torch.Tensor = None, joints: torch.Tensor = None, pose: torch.Tensor = None
+        self,
+        pc: torch.Tensor,
+        queries: torch.Tensor = None,
+        joints: torch.Tensor = None,
+        pose: torch.Tensor = None,
+        sampled_pc: torch.Tensor = None,
     ):
         """
         Args:
             pc: [B, `self.N`, 3]
             queries: [B, N2, 3]
+            sampled_pc: precomputed `self.fps(pc)`; FPS syncs with the host, so it must be run outside CUDA graphs
         Returns:
             [B, N2, `output_dim`]
         """
         if pc.shape[-1] > self.input_dim:
             pc = pc[..., : self.input_dim]
-        x = self.encode(pc)
+        x = self.encode(pc, sampled_pc)
 
         learnable_embeddings = (
             self.joints_embed if self.predict_joints else None,
@@ -873,6 +880,8 @@ class JointsAttentionCausal(nn.Module):
         tree_levels_mask = torch.tensor(kinematic_tree.tree_levels_mask)
         self.register_buffer("tree_levels_mask", tree_levels_mask, persistent=False)
         self.tree_levels_mask: torch.Tensor
+        # Kept on the host so that inference does not sync with the device for each level
+        self.tree_levels_nonempty = [any(mask) for mask in kinematic_tree.tree_levels_mask]
 
     def _forward(self, feat: torch.Tensor, out_gt: torch.Tensor = None):
         B, N, _ = feat.shape
@@ -881,8 +890,8 @@ class JointsAttentionCausal(nn.Module):
 
             out_gt = matrix_to_ortho6d(ortho6d_to_matrix(out_gt))
         out_gt_feat: torch.Tensor = self.encoder(out_gt)  # B, N, D
-        out_gt_feat = out_gt_feat.unsqueeze(1).expand(-1, N, -1, -1).clone()  # B, (N), N, D
-        out_gt_feat[~self.mask_parent.expand(B, -1, -1)] = 0
+        out_gt_feat = out_gt_feat.unsqueeze(1).expand(-1, N, -1, -1)  # B, (N), N, D
+        out_gt_feat = out_gt_feat.masked_fill(~self.mask_parent.expand(B, -1, -1).unsqueeze(-1), 0)
         out_gt_feat = out_gt_feat.sum(-2)  # B, (N), D
         if self.query_type == "embedding":
             in_feat = out_gt_feat + feat
@@ -925,10 +934,10 @@ class JointsAttentionCausal(nn.Module):
             out = self._forward(feat, out_gt)
         else:
             out = torch.zeros((B, N, self.out_dim), dtype=feat.dtype, device=feat.device)
-            for mask in self.tree_levels_mask:
-                if not any(mask):
+            for mask, nonempty in zip(self.tree_levels_mask, self.tree_levels_nonempty):
+                if not nonempty:
                     continue
                 out_ = self._forward(feat, out)
-                out[mask.expand(B, -1)] = out_[mask.expand(B, -1)]
+                out = torch.where(mask[None, :, None], out_, out)
         # assert out.isfinite().all()
         return out
@@ -2,54 +2,69 @@
 """
 serve_mia.py  –  GPU Cloud-Run micro-service for Make-It-Animatable
 ──────────────────────────────────────────────────────────────────
-POST /rig  {input_uri, animation_uri?, config{…}}  ➜  gs://…/rigged.glb
+POST /rig  {input_uri, animation_uri?, config{…}}  ➜  202 {job_id, state}
+GET  /jobs/{job_id}                               ➜  {state, result_uri?, error?}
 
 • Downloads input & optional animation from GCS
 • Calls Make-It-Animatable (inference) **without spawning a subprocess**
 • Uploads rigged GLB back to GCS
-• Returns JSON {job_id, result_uri}
+• Queues the job and returns immediately; poll /jobs/{job_id} for the URI
+  (status is mirrored to gs://…/rigs/{job_id}/status.json, so any instance
+  can answer the poll)
 
 Dependencies (add to Docker image):
-    fastapi uvicorn[standard] google-cloud-storage
+    fastapi uvicorn[standard] google-cloud-storage orjson msgspec
     # plus the ordinary requirements-demo.txt from Make-It-Animatable
 """
 
 from __future__ import annotations
 import os, json, uuid, tempfile, shutil, pathlib, typing as t
+import asyncio, threading, functools
 
 # ── Google Cloud ────────────────────────────────────────────────────────────
 from google.cloud import storage
+from google.cloud.exceptions import NotFound
 
 # ── FastAPI ─────────────────────────────────────────────────────────────────
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel, Field
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel
+import msgspec
 import uvicorn
 
 # ── Make-It-Animatable internals (monkey-patch Gradio bits) ────────────────
 import sys, types, importlib, contextlib
+import torch
+import trimesh
+
+# TF32 matmuls/convs on Ampere+ and cuDNN autotuning (inputs are fixed to N points)
+torch.set_float32_matmul_precision("high")
+torch.backends.cuda.matmul.allow_tf32 = True
+torch.backends.cudnn.benchmark = True
 
 # add repo root to sys.path for `import app`
 ROOT = pathlib.Path(__file__).resolve().parent
 sys.path.insert(0, str(ROOT))
 
-# patch dummy gradio UI symbols so `app.py` imports work headless
+# define dummy gradio UI symbols so `app.py` runs headless
 app_mod = importlib.import_module("app")
-app_mod.state = "state"
-for name in [
-    "output_joints_coarse", "output_normed_input", "output_sample",
-    "output_joints", "output_bw", "output_rest_lbs", "output_rest_vis",
-    "output_anim", "output_anim_vis"
-]:
-    setattr(app_mod, name, name)
+app_mod.install_headless_stubs()
+
+import app_jit  # pylint: disable=wrong-import-position
 
 from app import (  # type: ignore  pylint: disable=wrong-import-position
     DB, init_models, prepare_input, preprocess, infer, vis, vis_blender,
-    clear
+    clear, apply_output_dir, autocast_bf16, compile_models, uncompile_models, capture_cuda_graphs,
+    blender_worker, infer_bones_input, model_forward_bones_batch, str2bool,
 )
 
 # ── ENV / CONSTS ────────────────────────────────────────────────────────────
 UPLOAD_DIR = pathlib.Path("/tmp")        # Cloud-Run tmpfs
 OUTPUT_BUCKET = os.getenv("OUTPUT_BUCKET", "mia-results")
+USE_BF16 = str2bool(os.getenv("MIA_BF16", False))  # bf16 autocast around infer()
+# "persistent_ipc" keeps one Blender worker alive; "subprocess" spawns app_blender.py per request
+BLENDER_BACKEND = "auto" if os.getenv("MIA_BLENDER_BACKEND") == "subprocess" else "persistent_ipc"
+MAX_BATCH = int(os.getenv("MIA_MAX_BATCH", "8"))  # 1 disables cross-request batching
 
 if os.getenv("DISABLE_GCS") == "1":
     gcs = None                       # skip GCS when running locally
@@ -57,29 +72,84 @@ else:
     gcs = storage.Client()
 
 # ── Helpers ─────────────────────────────────────────────────────────────────
+@functools.lru_cache(maxsize=128)
 def split_gs(gs_uri: str) -> tuple[str, str]:
     if not gs_uri.startswith("gs://"):
         raise ValueError("uri must start with gs://")
     bucket, *blob = gs_uri[5:].split("/", 1)
     return bucket, blob[0]
 
-def gcs_download(gs_uri: str, dst: pathlib.Path):
-    bkt, blob = split_gs(gs_uri)
-    gcs.bucket(bkt).blob(blob).download_to_filename(dst)
+@functools.lru_cache(maxsize=8)
+def _bucket(name: str) -> storage.Bucket:
+    return gcs.bucket(name)
 
-def gcs_upload(src: pathlib.Path, gs_uri: str):
+def _blob(gs_uri: str) -> storage.Blob:
     bkt, blob = split_gs(gs_uri)
-    gcs.bucket(bkt).blob(blob).upload_from_filename(src)
+    return _bucket(bkt).blob(blob)
 
-def extract_db(result: dict) -> "DB":        # result dict stores state key
-    return result[app_mod.state]
+# the *_filename variants stream to/from disk in a single request and let the
+# library pick multipart vs. resumable upload from the file size
+def gcs_download(gs_uri: str, dst: pathlib.Path):
+    _blob(gs_uri).download_to_filename(dst)
+
+def gcs_upload(src: pathlib.Path, gs_uri: str):
+    _blob(gs_uri).upload_from_filename(src)
+
+# ── Model lifecycle ─────────────────────────────────────────────────────────
+_MODELS_READY = False
+_MODELS_LOCK = threading.Lock()
+
+def ensure_models():
+    """Loads the networks once per process; later calls are no-ops.
+    Thread-safe, since requests may call it from a worker thread."""
+    global _MODELS_READY
+    if _MODELS_READY:
+        return
+    with _MODELS_LOCK:
+        if not _MODELS_READY:
+            init_models()
+            compiled = _compile_models()
+            # reduce-overhead compilation already replays CUDA graphs
+            if os.getenv("MIA_CUDA_GRAPHS") == "1" and not compiled:
+                capture_cuda_graphs()
+            _MODELS_READY = True
+
+def _compile_models() -> bool:
+    """torch.compile of the networks that pass app.should_compile (CUDA,
+    large graphs, MIA_COMPILE != "0"); any failure during the first
+    (compiling) dummy pass falls back to eager modules."""
+    try:
+        if not compile_models(mode="reduce-overhead", dynamic=True):
+            return False
+        _run_tiny_dummy_pipeline()
+        print("torch.compile enabled")
+        return True
+    except Exception as exc:
+        uncompile_models()
+        print(f"torch.compile failed, falling back to eager: {exc}")
+        return False
+
+def _run_tiny_dummy_pipeline():
+    """Pushes a tiny placeholder mesh through prepare_input → preprocess → infer
+    so CUDA context / kernel selection is paid at startup, not by the first request.
+    The Numba opacity-mask kernel of the Gaussian Splat path is compiled here too."""
+    app_jit.warmup()
+    with tempfile.TemporaryDirectory(dir=UPLOAD_DIR) as tmpd:
+        dummy = pathlib.Path(tmpd) / "warmup.glb"
+        trimesh.creation.icosphere(subdivisions=1, radius=0.5).export(dummy)
+        with torch.inference_mode():
+            db = DB()
+            db = prepare_input(input_path=str(dummy), db=db, export_temp=False)
+            db = preprocess(db)
+            db = infer(False, db)
+        clear(db)
 
 # ── Core rig function  (no subprocess) ──────────────────────────────────────
 DEFAULT_OUTDIR = UPLOAD_DIR / "out"
 DEFAULT_BW_VIS_BONE = "LeftArm"
 
 # keys mirror the original CLI flags
-class RigConfig(BaseModel):
+class RigConfig(msgspec.Struct, kw_only=True):
     # input flags
     is_gs: bool = False
     opacity_threshold: float = 0.01
@@ -100,143 +170,347 @@ class RigConfig(BaseModel):
     # misc
     output_dir: str | None = None
 
+# one pipeline on the GPU at a time; everything else queues behind it
+_GPU_SLOT = asyncio.Semaphore(1)
+
+def _forward_bones_batch(pts_list: list[torch.Tensor]) -> list[tuple[torch.Tensor, torch.Tensor]]:
+    with torch.inference_mode(), autocast_bf16(USE_BF16):
+        return model_forward_bones_batch(pts_list)
+
+class BonesBatcher:
+    """Coalesces the bone-network forwards of concurrent jobs.
+
+    Every input is sampled to the same N points, so the joints/pose nets can
+    take a stacked batch; the skinning net sees per-mesh vertex counts and
+    stays per job. Once a request is queued the batcher waits for the GPU
+    slot; the jobs ahead of it in the slot finish their preprocessing and
+    queue meanwhile, so it then drains up to `max_batch` requests without any
+    extra wait, runs one forward and resolves each future with its slice."""
+
+    def __init__(self, max_batch: int):
+        self.max_batch = max_batch
+        self._queue: asyncio.Queue | None = None
+        self._task: asyncio.Task | None = None
+
+    async def submit(self, pts: torch.Tensor) -> tuple[torch.Tensor, torch.Tensor]:
+        if self._task is None or self._task.done():
+            self._queue = asyncio.Queue()
+            self._task = asyncio.create_task(self._loop())
+        fut = asyncio.get_running_loop().create_future()
+        await self._queue.put((pts, fut))
+        return await fut
+
+    def _drain(self, batch: list[tuple[torch.Tensor, asyncio.Future]]):
+        while len(batch) < self.max_batch and not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+        return batch
+
+    async def _loop(self):
+        while True:
+            batch = [await self._queue.get()]
+            try:
+                async with _GPU_SLOT:
+                    self._drain(batch)
+                    results = await asyncio.to_thread(_forward_bones_batch, [pts for pts, _ in batch])
+            except Exception as exc:
+                for _, fut in batch:
+                    if not fut.done():
+                        fut.set_exception(exc)
+                continue
+            for (_, fut), bones in zip(batch, results):
+                if not fut.done():
+                    fut.set_result(bones)
+
+_BONES_BATCHER = BonesBatcher(MAX_BATCH) if MAX_BATCH > 1 else None
+
 # GCS-based wrapper
-def run_mia_service(
+async def run_mia_service(
     input_uri: str,
     cfg: RigConfig,
     animation_uri: str | None = None,
-) -> pathlib.Path:
-    """Runs Make-It-Animatable end-to-end and returns local GLB path."""
-    init_models()     # idempotent; cached after first call
-
+    job_id: str | None = None,
+) -> str:
+    """Runs Make-It-Animatable end-to-end and returns the uploaded GLB URI.
+    The object is stored under `rigs/{job_id}/` so concurrent jobs with the
+    same input name don't overwrite each other's result."""
+    job_id = job_id or str(uuid.uuid4())
     with tempfile.TemporaryDirectory(dir=UPLOAD_DIR) as tmpd:
         tmp = pathlib.Path(tmpd)
-        local_in = tmp / pathlib.Path(input_uri).name
-        gcs_download(input_uri, local_in)
-
-        local_anim: pathlib.Path | None = None
-        if animation_uri:
-            if animation_uri.startswith("gs://"):
-                local_anim = tmp / pathlib.Path(animation_uri).name
-                gcs_download(animation_uri, local_anim)
-            else:
-                # Treat as local file path
-                local_anim = pathlib.Path(animation_uri)
-                if not local_anim.exists():
-                    raise ValueError(f"Local animation file not found: {animation_uri}")
-
-        # choose output dir
-        out_dir = pathlib.Path(cfg.output_dir) if cfg.output_dir else tmp / "out"
-        out_dir.mkdir(parents=True, exist_ok=True)
-
-        # 1 Prepare input
-        db = DB()
-        res = prepare_input(
-            input_path=str(local_in),
-            is_gs=cfg.is_gs,
-            opacity_threshold=cfg.opacity_threshold,
-            db=db,
-            export_temp=False,
-        )
-        db = extract_db(res)
-        db.output_dir = str(out_dir)           # force output dir
-
-        # Override default output paths when caller sets --output-dir
-        if cfg.output_dir:
-            def fp(name: str): return str(out_dir / name)
-            ext_in = local_in.suffix
-            db.joints_coarse_path = fp("joints_coarse.glb")
-            db.normed_path        = fp(f"normed{ext_in}")
-            db.sample_path        = fp("sample.glb")
-            db.bw_path            = fp("bw.glb")
-            db.joints_path        = fp("joints.glb")
-            ext_rest = "ply" if cfg.is_gs else "glb"
-            db.rest_lbs_path      = fp(f"rest_lbs.{ext_rest}")
-            db.rest_vis_path      = fp("rest.glb")
-            input_stem = local_in.stem
-            db.anim_path          = fp(f"{input_stem}.{'blend' if cfg.is_gs else 'fbx'}")
-            db.anim_vis_path      = fp(f"{input_stem}.glb")
-
-        # 2 Preprocess & 3 Infer
-        db = extract_db(preprocess(db))
-        db = extract_db(infer(cfg.use_normal, db))
-
-        # 4 Visualise weights
-        db = extract_db(
-            vis(cfg.bw_fix, cfg.bw_vis_bone, cfg.no_fingers, db)
+        # network-bound fetch overlaps with (cold) model loading
+        (local_in, local_anim), _ = await asyncio.gather(
+            _stage_download(input_uri, animation_uri, tmp),
+            asyncio.to_thread(ensure_models),   # no-op once the startup hook has run
         )
-
-        # 5 Generate animation (+ retarget)
-        # make rest_parts safe
-        safe_parts = cfg.rest_parts or []
-
-        # resolve animation path
-        anim_path = str(local_anim) if local_anim else None
-        
-        print("Running Blender step to generate animation")
-        db = extract_db(
-            vis_blender(
-                cfg.reset_to_rest,
-                cfg.no_fingers,
-                cfg.rest_pose,
-                safe_parts,
-                anim_path,
-                cfg.retarget,
-                cfg.inplace,
-                db,
-            )
+        if _BONES_BATCHER is None:
+            async with _GPU_SLOT:   # downloads of queued jobs still overlap
+                db = await asyncio.to_thread(_stage_prepare, local_in, cfg, tmp)
+                rigged_glb, db = await asyncio.to_thread(_stage_compute, local_anim, cfg, db)
+        else:
+            async with _GPU_SLOT:
+                db = await asyncio.to_thread(_stage_prepare, local_in, cfg, tmp)
+            # the slot is released here, so jobs queued behind this one can
+            # preprocess and join the same bones forward
+            bones_in = await asyncio.to_thread(infer_bones_input, db)
+            bones = await _BONES_BATCHER.submit(bones_in)
+            async with _GPU_SLOT:
+                rigged_glb, db = await asyncio.to_thread(_stage_compute, local_anim, cfg, db, bones)
+
+        # Upload to GCS before temp dir is deleted; runs alongside the cleanup
+        # and outside the GPU slot, so the next queued job can start meanwhile
+        result_uri = f"gs://{OUTPUT_BUCKET}/rigs/{job_id}/{rigged_glb.name}"
+        await asyncio.gather(
+            asyncio.to_thread(gcs_upload, rigged_glb, result_uri),
+            asyncio.to_thread(clear, db),
         )
-        # final GLB to return = db.anim_vis_path
-        rigged_glb = pathlib.Path(db.anim_vis_path)
-
-
-        if not rigged_glb.exists():
-            raise RuntimeError("Make-It-Animatable did not produce an output GLB")
-
-        # Upload to GCS before temp dir is deleted
-        result_uri = f"gs://{OUTPUT_BUCKET}/rigs/{rigged_glb.name}"
-        gcs_upload(rigged_glb, result_uri)
-
-        clear(db)
         return result_uri
-        
+
+async def _stage_download(
+    input_uri: str,
+    animation_uri: str | None,
+    tmp: pathlib.Path,
+) -> tuple[pathlib.Path, pathlib.Path | None]:
+    """Fetches input (and optional animation) into `tmp` concurrently."""
+    # validate everything before creating the download coroutines, so a bad
+    # animation path doesn't leave one of them un-awaited
+    local_anim: pathlib.Path | None = None
+    if animation_uri:
+        if animation_uri.startswith("gs://"):
+            local_anim = tmp / pathlib.Path(animation_uri).name
+        else:
+            # Treat as local file path
+            local_anim = pathlib.Path(animation_uri)
+            if not local_anim.exists():
+                raise ValueError(f"Local animation file not found: {animation_uri}")
+
+    local_in = tmp / pathlib.Path(input_uri).name
+    jobs = [asyncio.to_thread(gcs_download, input_uri, local_in)]
+    if animation_uri and animation_uri.startswith("gs://"):
+        jobs.append(asyncio.to_thread(gcs_download, animation_uri, local_anim))
+
+    await asyncio.gather(*jobs)
+    return local_in, local_anim
+
+def _stage_prepare(
+    local_in: pathlib.Path,
+    cfg: RigConfig,
+    tmp: pathlib.Path,
+) -> DB:
+    """Blocking pipeline, first half: prepare → preprocess."""
+    # choose output dir
+    out_dir = pathlib.Path(cfg.output_dir) if cfg.output_dir else tmp / "out"
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    # 1 Prepare input
+    db = DB()
+    db = prepare_input(
+        input_path=str(local_in),
+        is_gs=cfg.is_gs,
+        opacity_threshold=cfg.opacity_threshold,
+        db=db,
+        export_temp=False,
+    )
+    # force output dir (same path layout as cli.py --output-dir)
+    apply_output_dir(db, str(out_dir), str(local_in), cfg.is_gs)
+
+    # 2 Preprocess
+    return preprocess(db)
+
+def _stage_compute(
+    local_anim: pathlib.Path | None,
+    cfg: RigConfig,
+    db: DB,
+    bones: tuple[torch.Tensor, torch.Tensor] | None = None,
+) -> tuple[pathlib.Path, DB]:
+    """Blocking pipeline, second half: infer → vis → Blender; returns the GLB.
+    `bones` are the batched joints/pose for this job, if already computed."""
+    # 3 Infer
+    with torch.inference_mode(), autocast_bf16(USE_BF16):
+        db = infer(cfg.use_normal, db, bones)
+    db.release_after("infer")
+
+    # 4 Visualise weights (edits inference tensors in place → same mode)
+    with torch.inference_mode():
+        db = vis(cfg.bw_fix, cfg.bw_vis_bone, cfg.no_fingers, db)
+    # Blender step is CPU-only → hand cached GPU memory back before it
+    db.release_after("vis")
+    clear()
+
+    # 5 Generate animation (+ retarget)
+    # make rest_parts safe
+    safe_parts = cfg.rest_parts or []
+
+    # resolve animation path
+    anim_path = str(local_anim) if local_anim else None
+    
+    print("Running Blender step to generate animation")
+    db = vis_blender(
+        cfg.reset_to_rest,
+        cfg.no_fingers,
+        cfg.rest_pose,
+        safe_parts,
+        anim_path,
+        cfg.retarget,
+        cfg.inplace,
+        db,
+        backend=BLENDER_BACKEND,
+    )
+    # final GLB to return = db.anim_vis_path
+    rigged_glb = pathlib.Path(db.anim_vis_path)
+
+
+    if not rigged_glb.exists():
+        raise RuntimeError("Make-It-Animatable did not produce an output GLB")
+
+    return rigged_glb, db
+    
 
 # ── FastAPI service layer ───────────────────────────────────────────────────
-class RigRequest(BaseModel):
+# request bodies are decoded by msgspec (lax, like pydantic) instead of
+# FastAPI's pydantic validation; responses stay pydantic models
+class RigRequest(msgspec.Struct, kw_only=True):
     input_uri: str
     animation_uri: str | None = None
-    config: RigConfig = Field(default_factory=RigConfig)
+    config: RigConfig = msgspec.field(default_factory=RigConfig)
+
+_RIG_DECODER = msgspec.json.Decoder(RigRequest, strict=False)
+(_RIG_SCHEMA,), _RIG_COMPONENTS = msgspec.json.schema_components(
+    [RigRequest], ref_template="#/components/schemas/{name}"
+)
 
-class RigResponse(BaseModel):
+class JobStatus(BaseModel):
     job_id: str
-    result_uri: str
+    state: t.Literal["queued", "running", "done", "failed"] = "queued"
+    result_uri: str | None = None
+    error: str | None = None
+
+app = FastAPI(
+    title="Make-It-Animatable-Service",
+    version="2.0-inproc",
+    default_response_class=ORJSONResponse,
+)
 
-app = FastAPI(title="Make-It-Animatable-Service", version="2.0-inproc")
+def _openapi() -> dict:
+    """Default OpenAPI doc plus the msgspec request schemas."""
+    if app.openapi_schema is None:
+        schema = FastAPI.openapi(app)
+        schema.setdefault("components", {}).setdefault("schemas", {}).update(_RIG_COMPONENTS)
+    return app.openapi_schema
+
+app.openapi = _openapi
+
+# in-memory job table (single worker process); oldest finished jobs are
+# evicted once MAX_JOBS is exceeded. Each state change is also written next to
+# the result in GCS, since Cloud Run may route a poll to another instance.
+MAX_JOBS = int(os.getenv("MAX_JOBS", 1000))
+_JOBS: dict[str, JobStatus] = {}
+_TASKS: dict[str, asyncio.Task] = {}    # keep refs so tasks aren't GC'd
+
+def _evict_jobs():
+    for job_id in [k for k, v in _JOBS.items() if v.state in ("done", "failed")]:
+        if len(_JOBS) <= MAX_JOBS:
+            break
+        del _JOBS[job_id]
+
+def _status_uri(job_id: str) -> str:
+    return f"gs://{OUTPUT_BUCKET}/rigs/{job_id}/status.json"
+
+async def _publish_job(job: JobStatus):
+    if gcs is None:
+        return
+    try:
+        await asyncio.to_thread(
+            _blob(_status_uri(job.job_id)).upload_from_string,
+            job.model_dump_json(), content_type="application/json",
+        )
+    except Exception as exc:   # polling the owning instance still works
+        print(f"Could not publish status of job {job.job_id}: {exc!r}")
+
+def _load_job(job_id: str) -> JobStatus | None:
+    if gcs is None:
+        return None
+    try:
+        return JobStatus.model_validate_json(_blob(_status_uri(job_id)).download_as_bytes())
+    except NotFound:
+        return None
+
+async def _run_job(job_id: str, req: RigRequest):
+    job = _JOBS[job_id]
+    job.state = "running"
+    await _publish_job(job)
+    try:
+        job.result_uri = await run_mia_service(
+            input_uri=req.input_uri,
+            cfg=req.config,
+            animation_uri=req.animation_uri,
+            job_id=job_id,
+        )
+        job.state = "done"
+    except Exception as exc:
+        print(f"Job {job_id} failed: {exc!r}")
+        job.error = str(exc)
+        job.state = "failed"
+    finally:
+        await _publish_job(job)
+        _TASKS.pop(job_id, None)
+
+@app.on_event("startup")
+def _warm():
+    ensure_models()
+    if os.getenv("MIA_WARMUP", "1") != "0":
+        _run_tiny_dummy_pipeline()
+    if BLENDER_BACKEND == "persistent_ipc":
+        blender_worker.start()
+
+@app.on_event("shutdown")
+def _stop_blender():
+    blender_worker.stop()
+
+_HEALTHZ_BODY = b'{"status":"ok"}'
 
 @app.get("/healthz")
 def health():
-    return {"status": "ok"}
+    return Response(_HEALTHZ_BODY, media_type="application/json")
+
+@app.post(
+    "/rig",
+    response_model=JobStatus,
+    status_code=202,
+    openapi_extra={"requestBody": {
+        "required": True,
+        "content": {"application/json": {"schema": _RIG_SCHEMA}},
+    }},
+)
+async def rig(request: Request):
+    try:
+        req = _RIG_DECODER.decode(await request.body())
+    except (msgspec.ValidationError, msgspec.DecodeError) as exc:
+        raise HTTPException(422, str(exc)) from exc
 
-@app.post("/rig", response_model=RigResponse)
-def rig(req: RigRequest):
     job_id = str(uuid.uuid4())
     # Debug print input parameters
     print(f"DEBUG - Input parameters:")
     print(f"  job_id: {job_id}")
     print(f"  input_uri: {req.input_uri}")
     print(f"  animation_uri: {req.animation_uri}")
-    print(f"  config: {json.dumps(req.config.model_dump(), indent=2)}")
-    
-    try:
-        result_uri = run_mia_service(
-            input_uri=req.input_uri,
-            cfg=req.config,
-            animation_uri=req.animation_uri,
-        )
-        return RigResponse(job_id=job_id, result_uri=result_uri)
-
-    except Exception as exc:
-        raise HTTPException(500, str(exc)) from exc
+    print(f"  config: {json.dumps(msgspec.to_builtins(req.config), indent=2)}")
+
+    _JOBS[job_id] = JobStatus(job_id=job_id)
+    _evict_jobs()
+    _TASKS[job_id] = asyncio.create_task(_run_job(job_id, req))
+    return _JOBS[job_id]
+
+@app.get("/jobs/{job_id}", response_model=JobStatus)
+async def job_status(job_id: str):
+    job = _JOBS.get(job_id)
+    if job is None:
+        try:
+            uuid.UUID(job_id)   # only ids we issued map to a status object
+        except ValueError:
+            raise HTTPException(404, f"Unknown job: {job_id}") from None
+        job = await asyncio.to_thread(_load_job, job_id)
+    if job is None:
+        raise HTTPException(404, f"Unknown job: {job_id}")
+    return job
 
 # ── Entrypoint for Docker / Cloud Run ───────────────────────────────────────
 if __name__ == "__main__":
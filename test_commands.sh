@@ -20,3 +20,6 @@ curl -X POST http://localhost:8080/rig \
           "rest_parts": []
         }
       }'
+
+# /rig returns 202 {job_id, state}; poll until state is "done" or "failed"
+curl http://localhost:8080/jobs/<job_id>
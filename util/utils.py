@@ -1,4 +1,6 @@
 import argparse
+import contextlib
+import inspect
 import os
 import sys
 from datetime import datetime
@@ -196,6 +198,33 @@ def find_ckpt(ckpt_dir: str, epoch=-1, prefix="checkpoint-", suffix=".pth"):
     return os.path.join(ckpt_dir, file_list[0])
 
 
+def load_model_state_dict(ckpt_path: str) -> dict[str, torch.Tensor]:
+    """
+    Load the `model` state dict of a checkpoint.
+    A `.safetensors` sibling (see `ckpt_to_safetensors`) is preferred since it is memory-mapped without unpickling;
+    otherwise the `.pth` is memory-mapped by `torch.load` when supported (torch>=2.1).
+    """
+    st_path = f"{os.path.splitext(ckpt_path)[0]}.safetensors"
+    if os.path.isfile(st_path):
+        with contextlib.suppress(ImportError):
+            from safetensors.torch import load_file
+
+            return load_file(st_path, device="cpu")
+    kwargs = {"mmap": True} if "mmap" in inspect.signature(torch.load).parameters else {}
+    return torch.load(ckpt_path, map_location="cpu", **kwargs)["model"]
+
+
+def ckpt_to_safetensors(ckpt_path: str) -> str:
+    """Export the `model` state dict of a checkpoint next to it as `.safetensors`."""
+    from safetensors.torch import save_file
+
+    st_path = f"{os.path.splitext(ckpt_path)[0]}.safetensors"
+    state_dict = torch.load(ckpt_path, map_location="cpu")["model"]
+    # safetensors rejects shared / non-contiguous storages
+    save_file({k: v.detach().clone(memory_format=torch.contiguous_format) for k, v in state_dict.items()}, st_path)
+    return st_path
+
+
 def synchronize():
     """
     Helper function to synchronize (barrier) among all processes when